@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
+import os
 import json
 import time
+import gzip
+import hashlib
 import ssl
-import urllib.request
+import base64
+import threading
+import http.client
 import urllib.parse
+import urllib.request
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # ====== CONFIG (match your dashboard) ======
@@ -16,78 +24,251 @@ DEFAULT_DECIMALS = 18
 HTTP_TIMEOUT = 12
 RETRIES = 1
 BACKOFF_START = 0.8
+RETRY_STATUSES = (502, 503, 504)
+POOL_MAXSIZE = 8  # idle keep-alive connections kept per upstream host
+MAX_REDIRECTS = 10  # same limit urllib.request applies
 
 CACHE_TTL_SEC = 60
-DENOM_TTL_SEC = 6 * 60 * 60  # 6h
+CACHE_MAX_STALE_SEC = 10 * CACHE_TTL_SEC  # past this, block on a fresh fetch
+PREFETCH_INTERVAL_SEC = CACHE_TTL_SEC - 5  # background refresh ahead of TTL expiry
+# 6h: re-derive display decimals. Pages denoms_metadata only while no entry
+# has been found; a found entry is reused until the base denom changes.
+DENOM_TTL_SEC = 6 * 60 * 60
+BOND_DENOM_TTL_SEC = 24 * 60 * 60  # 24h (bond/mint denom; fixed at genesis in practice)
+
+# skip staking/mint params detection entirely, e.g. GL1_BOND_DENOM=ul1
+BOND_DENOM_OVERRIDE = os.environ.get("GL1_BOND_DENOM", "").strip()
 
 OUT_MAX_FRAC = 18  # output precision (trimmed)
 
 HOST = "0.0.0.0"
 PORT = 8787
+CLIENT_IDLE_TIMEOUT = 30  # seconds an idle keep-alive client may hold its thread
+LISTEN_BACKLOG = 128
+
+_TEN_18 = 10 ** 18
+_POW10 = tuple(10 ** i for i in range(40))
 
 _ssl_ctx = ssl.create_default_context()
+_ssl_ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+_ssl_ctx.set_ciphers("ECDHE+AESGCM:ECDHE+CHACHA20")  # TLS 1.2 only; 1.3 suites unaffected
+_ssl_ctx.options &= ~ssl.OP_NO_TICKET  # keep session tickets on so reconnects can resume
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gl1-fetch")
 
 # ====== small utils ======
+# Denom strings come from a tiny set ("ul1", "L1", ...), so memoize.
+@lru_cache(maxsize=256)
 def _norm(s: str) -> str:
     return (s or "").strip().lower()
 
-def _is_denom_base_like(denom: str, base_denom: str) -> bool:
-    dn = _norm(denom)
-    bd = _norm(base_denom)
+@lru_cache(maxsize=16)
+def _base_like_denoms(base_denom: str) -> frozenset:
+    """Normalized denoms that count as the base coin for `base_denom`."""
     disp = _norm(DISPLAY_DENOM)
-    if not dn:
-        return False
-    if dn == bd:
-        return True
-    if dn == disp:
-        return True
-    if dn == ("u" + disp):
-        return True
-    # keep this in case your chain sometimes uses it
-    if dn == "el1":
-        return True
-    return False
+    # "el1": keep this in case your chain sometimes uses it
+    return frozenset(d for d in (_norm(base_denom), disp, "u" + disp, "el1") if d)
+
+@lru_cache(maxsize=1024)
+def _is_denom_base_like(denom: str, base_denom: str) -> bool:
+    return _norm(denom) in _base_like_denoms(base_denom)
 
 def _sleep(sec: float) -> None:
     time.sleep(sec)
 
+# ====== upstream HTTP (keep-alive pool) ======
+_HEADERS = {"User-Agent": "GenesisL1-api/1.0", "Accept": "application/json"}
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# HTTP(S)_PROXY / NO_PROXY, read once like the rest of the config
+_PROXIES = urllib.request.getproxies()
+
+_conn_pool = {}  # (scheme, netloc, proxy) -> [idle connections]
+_conn_lock = threading.Lock()
+
+_tls_sessions = {}  # (host, port) -> last ssl.SSLSession seen
+
+def _tls_key(conn):
+    # through a proxy tunnel, the TLS peer is the tunnel target, not the proxy
+    return (conn._tunnel_host or conn.host, conn._tunnel_port or conn.port)
+
+class _ResumingHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPSConnection that offers the host's last TLS session on connect."""
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host or self.host
+        self.sock = self._context.wrap_socket(
+            self.sock,
+            server_hostname=server_hostname,
+            session=_tls_sessions.get(_tls_key(self)),
+        )
+
+class UpstreamHTTPError(Exception):
+    def __init__(self, status: int, reason: str, url: str):
+        super().__init__(f"HTTP {status} {reason} for {url}")
+        self.status = status
+
+def _proxy_for(scheme: str, host: str):
+    """Proxy URL from the environment for this target, or None."""
+    proxy = _PROXIES.get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    return proxy if "://" in proxy else "http://" + proxy
+
+def _proxy_auth_headers(proxy: str) -> dict:
+    p = urllib.parse.urlsplit(proxy)
+    if not p.username:
+        return {}
+    cred = f"{urllib.parse.unquote(p.username)}:{urllib.parse.unquote(p.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(cred.encode("utf-8")).decode("ascii")}
+
+def _checkout_conn(key, timeout: float):
+    """Return (conn, reused). Reused connections come from the idle pool."""
+    with _conn_lock:
+        idle = _conn_pool.get(key)
+        if idle:
+            conn = idle.pop()
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+    scheme, netloc, proxy = key
+    if proxy:
+        p = urllib.parse.urlsplit(proxy)
+        if scheme == "https":
+            conn = _ResumingHTTPSConnection(p.hostname, p.port, timeout=timeout, context=_ssl_ctx)
+            conn.set_tunnel(netloc, headers=_proxy_auth_headers(proxy))
+            return conn, False
+        return http.client.HTTPConnection(p.hostname, p.port, timeout=timeout), False
+    if scheme == "https":
+        return _ResumingHTTPSConnection(netloc, timeout=timeout, context=_ssl_ctx), False
+    return http.client.HTTPConnection(netloc, timeout=timeout), False
+
+def _remember_tls_session(conn, sock) -> None:
+    # TLS 1.3 tickets arrive after the handshake, so grab the session once
+    # response headers have been read rather than right after connect
+    session = getattr(sock, "session", None)
+    if session is not None:
+        _tls_sessions[_tls_key(conn)] = session
+
+def _checkin_conn(key, conn) -> None:
+    with _conn_lock:
+        idle = _conn_pool.setdefault(key, [])
+        if len(idle) < POOL_MAXSIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+def _request_once(url: str, timeout: float):
+    """Single GET over a pooled keep-alive connection. Returns (status, reason, body, location)."""
+    parts = urllib.parse.urlsplit(url)
+    proxy = _proxy_for(parts.scheme, parts.hostname or "")
+    key = (parts.scheme, parts.netloc, proxy)
+    headers = _HEADERS
+    if proxy and parts.scheme == "http":
+        # plain-HTTP proxying: absolute-form request line, auth on each request
+        target = urllib.parse.urlunsplit(parts._replace(fragment=""))
+        headers = {**_HEADERS, **_proxy_auth_headers(proxy)}
+    else:
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+    while True:
+        conn, reused = _checkout_conn(key, timeout)
+        try:
+            conn.request("GET", target, headers=headers)
+            # keep a handle: on "Connection: close" getresponse() detaches
+            # the socket from conn, but its session is still worth resuming
+            sock = conn.sock
+            resp = conn.getresponse()
+            _remember_tls_session(conn, sock)
+            data = resp.read()
+        except (http.client.RemoteDisconnected, ConnectionError):
+            conn.close()
+            if reused:
+                # idle socket was closed by the server; try the next one
+                continue
+            raise
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            _checkin_conn(key, conn)
+        return resp.status, resp.reason, data, resp.getheader("Location")
+
+def _request_bytes(url: str, timeout: float):
+    """GET `url`, following redirects like urlopen did. Returns (status, reason, body)."""
+    for _ in range(MAX_REDIRECTS + 1):
+        status, reason, data, location = _request_once(url, timeout)
+        if status not in _REDIRECT_STATUSES or not location:
+            return status, reason, data
+        next_url = urllib.parse.urljoin(url, location)
+        if urllib.parse.urlsplit(next_url).scheme not in ("http", "https"):
+            raise UpstreamHTTPError(status, f"redirect to unsupported URL {next_url}", url)
+        url = next_url
+    raise UpstreamHTTPError(status, "too many redirects", url)
+
 def _fetch_json(url: str, timeout: int = HTTP_TIMEOUT, retries: int = RETRIES, backoff: float = BACKOFF_START):
     last_err = None
     for i in range(retries + 1):
         try:
-            req = urllib.request.Request(url, headers={"User-Agent": "GenesisL1-api/1.0"})
-            with urllib.request.urlopen(req, timeout=timeout, context=_ssl_ctx) as resp:
-                data = resp.read()
-            return json.loads(data.decode("utf-8"))
+            status, reason, data = _request_bytes(url, timeout)
+            if status >= 400:
+                err = UpstreamHTTPError(status, reason, url)
+                if status not in RETRY_STATUSES:
+                    raise err  # not transient; retrying won't help
+                last_err = err
+            else:
+                return json.loads(data.decode("utf-8"))
+        except UpstreamHTTPError:
+            raise
         except Exception as e:
             last_err = e
-            if i < retries:
-                _sleep(backoff)
-                backoff *= 1.8
-            else:
-                raise last_err
+        if i < retries:
+            _sleep(backoff)
+            backoff *= 1.8
+    raise last_err
 
 def _pow10_big(n: int) -> int:
     if n <= 0:
         return 1
-    return 10 ** n
+    return _POW10[n] if n < len(_POW10) else 10 ** n
 
 def _parse_dec_to_scaled18(dec_str: str) -> int:
     """
     Parse sdk.Dec-style decimal string into integer scaled by 1e18.
     Example: "12.34" => 12340000000000000000
+    Non-digit characters are ignored, extra fraction digits truncated.
     """
     s0 = str(dec_str or "0").strip()
-    if not s0:
-        return 0
     neg = s0.startswith("-")
     if neg:
         s0 = s0[1:]
-    whole, dot, frac = s0.partition(".")
-    whole = "".join(ch for ch in whole if ch.isdigit()) or "0"
-    frac = "".join(ch for ch in frac if ch.isdigit())
-    frac18 = (frac + "0" * 18)[:18]
-    val = int(whole) * (10 ** 18) + int(frac18 or "0")
+
+    # fast path: well-formed "123.456..." as the LCD sends it, parsed in C
+    whole, _, frac = s0.partition(".")
+    if (whole.isascii() and whole.isdigit()
+            and (not frac or (frac.isascii() and frac.isdigit()))):
+        val = int(whole) * _TEN_18 + (int(frac[:18].ljust(18, "0")) if frac else 0)
+        return -val if neg else val
+
+    # malformed input: scan once, skipping anything that isn't a digit
+    whole = 0
+    frac = 0
+    flen = 0
+    seen_dot = False
+    for ch in s0:
+        if ch == ".":
+            seen_dot = True
+        elif "0" <= ch <= "9":
+            if not seen_dot:
+                whole = whole * 10 + (ord(ch) - 48)
+            elif flen < 18:
+                frac = frac * 10 + (ord(ch) - 48)
+                flen += 1
+    val = whole * _TEN_18 + frac * _POW10[18 - flen]
     return -val if neg else val
 
 def _format_units(amount_int: int, decimals: int, max_frac: int = OUT_MAX_FRAC) -> str:
@@ -97,38 +278,45 @@ def _format_units(amount_int: int, decimals: int, max_frac: int = OUT_MAX_FRAC)
     """
     neg = amount_int < 0
     a = -amount_int if neg else amount_int
+    sign = "-" if neg else ""
     if decimals <= 0:
-        return ("-" if neg else "") + str(a)
-
-    base = _pow10_big(decimals)
-    whole = a // base
-    frac = a % base
+        return f"{sign}{a}"
 
-    frac_full = str(frac).rjust(decimals, "0")
+    whole, frac = divmod(a, _pow10_big(decimals))
     take = max(0, min(decimals, int(max_frac)))
-    frac_part = frac_full[:take] if take < decimals else frac_full
-    frac_part = frac_part.rstrip("0")
-
-    s = str(whole) + (("." + frac_part) if frac_part else "")
-    return ("-" + s) if neg else s
+    if frac == 0 or take == 0:
+        return f"{sign}{whole}"
+
+    frac_part = f"{frac:0{decimals}d}"[:take].rstrip("0")
+    return f"{sign}{whole}.{frac_part}" if frac_part else f"{sign}{whole}"
+
+def _to_int(x) -> int:
+    """LCD integer amounts arrive as JSON strings; None/"" count as 0."""
+    if isinstance(x, str):
+        return int(x) if x else 0
+    if isinstance(x, (int, float)):
+        return int(x)
+    if x is None:
+        return 0
+    raise TypeError(f"expected integer amount, got {type(x).__name__}")
 
 def _clamp_nonneg(x: int) -> int:
     return 0 if x < 0 else x
 
 # ====== denom/decimals detection (cached) ======
 _denom_cache = {
-    "ts": 0.0,
-    "base_denom": DEFAULT_BASE_DENOM,
+    "bond_denom_ts": 0.0,
+    "decimals_ts": 0.0,
+    "base_denom": BOND_DENOM_OVERRIDE or DEFAULT_BASE_DENOM,
     "decimals": DEFAULT_DECIMALS,
+    # last denoms_metadata walk, keyed by the base denom it was run for
+    "metadata_base": "",
+    "metadata": None,
 }
 
-def _detect_base_denom_and_decimals():
-    now = time.time()
-    if now - _denom_cache["ts"] < DENOM_TTL_SEC:
-        return _denom_cache["base_denom"], _denom_cache["decimals"]
-
-    base = _denom_cache["base_denom"] or DEFAULT_BASE_DENOM
-    dec = _denom_cache["decimals"] or DEFAULT_DECIMALS
+def _detect_base_denom():
+    """Bond/mint denom from the LCD, or None if neither params call returned one."""
+    base = None
 
     # staking params -> bond denom
     try:
@@ -148,52 +336,100 @@ def _detect_base_denom_and_decimals():
     except Exception:
         pass
 
+    return base
+
+def _detect_base_denom_and_decimals():
+    now = time.time()
+    prev_base = _denom_cache["base_denom"]
+    base_fresh = BOND_DENOM_OVERRIDE or now - _denom_cache["bond_denom_ts"] < BOND_DENOM_TTL_SEC
+    if base_fresh and now - _denom_cache["decimals_ts"] < DENOM_TTL_SEC:
+        return prev_base, _denom_cache["decimals"]
+
+    if base_fresh:
+        base = prev_base
+    else:
+        base = _detect_base_denom()
+        if base is None:
+            # upstream unreachable: keep the previous denom but don't pin it,
+            # so the next refresh asks again
+            base = prev_base
+        else:
+            _denom_cache.update({"bond_denom_ts": now, "base_denom": base})
+        if _norm(base) == _norm(prev_base) and now - _denom_cache["decimals_ts"] < DENOM_TTL_SEC:
+            return base, _denom_cache["decimals"]
+
+    dec = _denom_cache["decimals"] or DEFAULT_DECIMALS
+
     # denom metadata -> display exponent for L1 (optional)
-    try:
-        next_key = ""
-        found = None
-        for _ in range(30):
-            url = f"{COSMOS_LCD}/cosmos/bank/v1beta1/denoms_metadata?pagination.limit=200"
-            if next_key:
-                url += "&pagination.key=" + urllib.parse.quote(next_key, safe="")
-            j = _fetch_json(url)
-            metas = j.get("metadatas", []) or []
-            found = next((m for m in metas if _norm(m.get("base")) == _norm(base)), None)
-            if not found:
-                found = next((m for m in metas if _norm(m.get("display")) == _norm(DISPLAY_DENOM)), None)
-            if found:
-                break
-            next_key = (j.get("pagination") or {}).get("next_key") or ""
-            if not next_key:
-                break
+    # Metadata is effectively static: once an entry is found for this base it
+    # is reused without re-paging; a miss is re-paged every DENOM_TTL_SEC.
+    found = None
+    if _norm(_denom_cache["metadata_base"]) == _norm(base):
+        found = _denom_cache["metadata"]
 
-        if found:
-            denom_units = found.get("denom_units", []) or []
-            disp = _norm(found.get("display") or DISPLAY_DENOM)
-            du = next((u for u in denom_units if _norm(u.get("denom")) == disp), None)
-            if du and isinstance(du.get("exponent"), int):
-                dec = du["exponent"]
-    except Exception:
-        pass
+    if found is None:
+        try:
+            nb = _norm(base)
+            nd = _norm(DISPLAY_DENOM)
+            next_key = ""
+            for _ in range(30):
+                url = f"{COSMOS_LCD}/cosmos/bank/v1beta1/denoms_metadata?pagination.limit=200"
+                if next_key:
+                    url += "&pagination.key=" + urllib.parse.quote(next_key, safe="")
+                j = _fetch_json(url)
+                metas = j.get("metadatas", []) or []
+                if not metas:
+                    break
+                by_display = None
+                for m in metas:
+                    if _norm(m.get("base")) == nb:
+                        found = m
+                        break
+                    if by_display is None and _norm(m.get("display")) == nd:
+                        by_display = m
+                if found is None:
+                    found = by_display
+                if found:
+                    break
+                next_key = (j.get("pagination") or {}).get("next_key") or ""
+                if not next_key:
+                    break
+            _denom_cache.update({"metadata_base": base, "metadata": found})
+        except Exception:
+            pass
+
+    if found:
+        denom_units = found.get("denom_units", []) or []
+        disp = _norm(found.get("display") or DISPLAY_DENOM)
+        for du in denom_units:
+            if _norm(du.get("denom")) == disp:
+                if isinstance(du.get("exponent"), int):
+                    dec = du["exponent"]
+                break
 
-    _denom_cache.update({"ts": now, "base_denom": base, "decimals": dec})
+    _denom_cache.update({"decimals_ts": now, "decimals": dec})
     return base, dec
 
 # ====== compute API data (cached) ======
-_api_cache = {"ts": 0.0, "data": None}
+# "response" holds the prebuilt HTTP/1.1 responses for the current payload,
+# swapped as one value: {"data": payload, "identity": variant, "gzip": variant,
+# "pretty": variant or None (built on first ?pretty=1)}, where a variant is
+# {"etag": ..., "ok": (status_line, rest), "not_modified": (status_line, rest)};
+# Date/Server are spliced in between the two when the response is written
+_api_cache = {"ts": 0.0, "data": None, "response": None}
 
 def _get_supply_raw(base_denom: str) -> int:
     # preferred endpoint
     try:
         sup = _fetch_json(f"{COSMOS_LCD}/cosmos/bank/v1beta1/supply/by_denom?denom={urllib.parse.quote(base_denom, safe='')}")
-        amt = (sup.get("amount") or {}).get("amount") or sup.get("amount") or "0"
-        return int(str(amt))
+        amt = (sup.get("amount") or {}).get("amount") or sup.get("amount")
+        return _to_int(amt)
     except Exception:
         # fallback: scan full supply
         sup_all = _fetch_json(f"{COSMOS_LCD}/cosmos/bank/v1beta1/supply?pagination.limit=100000")
         for c in sup_all.get("supply", []) or []:
             if _is_denom_base_like(c.get("denom"), base_denom):
-                return int(str(c.get("amount") or "0"))
+                return _to_int(c.get("amount"))
         return 0
 
 def _get_community_pool_scaled18(base_denom: str) -> int:
@@ -201,31 +437,31 @@ def _get_community_pool_scaled18(base_denom: str) -> int:
     coins = j.get("community_pool") or j.get("pool") or []
     if not isinstance(coins, list):
         coins = []
+    # only base-like coins are parsed; "ul1" and "UL1" both count
+    accepted = _base_like_denoms(base_denom)
     total = 0
     for c in coins:
-        if _is_denom_base_like(c.get("denom"), base_denom) and c.get("amount") is not None:
+        if isinstance(c, dict) and c.get("amount") is not None and _norm(c.get("denom")) in accepted:
             total += _parse_dec_to_scaled18(c["amount"])
     return total
 
 def _get_total_staked_raw() -> int:
     j = _fetch_json(f"{COSMOS_LCD}/cosmos/staking/v1beta1/pool")
     pool = j.get("pool") or {}
-    bonded = int(str(pool.get("bonded_tokens") or "0"))
-    not_bonded = int(str(pool.get("not_bonded_tokens") or "0"))
+    bonded = _to_int(pool.get("bonded_tokens"))
+    not_bonded = _to_int(pool.get("not_bonded_tokens"))
     return bonded + not_bonded
 
 def compute_api_payload():
     base, decimals = _detect_base_denom_and_decimals()
 
-    supply_raw = _get_supply_raw(base)                  # base atomics
-    staked_raw = _get_total_staked_raw()                # base atomics
-    comm_scaled18 = _get_community_pool_scaled18(base)  # base atomics * 1e18 (sdk.Dec)
-
-    # Do subtraction at a common scale: *1e18
-    supply_scaled18 = supply_raw * (10 ** 18)
-    staked_scaled18 = staked_raw * (10 ** 18)
-
-
+    # independent endpoints: fetch concurrently over the shared connection pool
+    f_sup = _pool.submit(_get_supply_raw, base)
+    f_stk = _pool.submit(_get_total_staked_raw)
+    f_comm = _pool.submit(_get_community_pool_scaled18, base)
+    supply_raw = f_sup.result()      # base atomics
+    staked_raw = f_stk.result()      # base atomics
+    comm_scaled18 = f_comm.result()  # base atomics * 1e18 (sdk.Dec)
 
     return {
         "circulating_supply": _format_units(supply_raw, decimals, OUT_MAX_FRAC),
@@ -235,35 +471,187 @@ def compute_api_payload():
 
     }
 
+# single-flight: at most one refresh runs at a time; while it does,
+# _refresh_event is set to an Event that fires when it finishes
+_refresh_lock = threading.Lock()
+_refresh_event = None
+
+def _build_response(body: bytes, etag: str, extra_headers: bytes = b"") -> dict:
+    common = (
+        b"Access-Control-Allow-Origin: *\r\n"
+        b"Cache-Control: public, max-age=30\r\n"
+        b"Vary: Accept-Encoding\r\n"
+        b"ETag: " + etag.encode("ascii") + b"\r\n"
+    )
+    return {
+        "etag": etag,
+        "ok": (
+            b"HTTP/1.1 200 OK\r\n",
+            b"Content-Type: application/json; charset=utf-8\r\n" + common + extra_headers +
+            b"Content-Length: " + str(len(body)).encode("ascii") + b"\r\n"
+            b"\r\n" + body,
+        ),
+        "not_modified": (b"HTTP/1.1 304 Not Modified\r\n", common + b"\r\n"),
+    }
+
+def _build_responses(payload, body: bytes) -> dict:
+    digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+    identity = _build_response(body, f'"{digest}"')
+    gz = gzip.compress(body, compresslevel=6)
+    return {
+        "data": payload,
+        "identity": identity,
+        # small bodies can grow under gzip; only use it when it actually helps
+        "gzip": (
+            _build_response(gz, f'"{digest}-gz"', b"Content-Encoding: gzip\r\n")
+            if len(gz) < len(body) else identity
+        ),
+        "pretty": None,
+    }
+
+def _pretty_response(resp: dict) -> dict:
+    pretty = resp["pretty"]
+    if pretty is None:
+        body = (json.dumps(resp["data"], indent=2) + "\n").encode("utf-8")
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        pretty = resp["pretty"] = _build_response(body, f'"{digest}-pretty"')
+    return pretty
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() != "gzip":
+            continue
+        q = params.strip().lower()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # weak comparison, as If-None-Match requires
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+def _store_payload(payload, ts: float) -> None:
+    # serialize (and gzip) once per refresh; GETs just write these bytes
+    body = (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+    _api_cache.update({"ts": ts, "data": payload, "response": _build_responses(payload, body)})
+
+def _claim_refresh(max_age: float):
+    """
+    Returns (event, leader). The leader must call _run_refresh(event);
+    others may wait on event. (None, False) means the cache became fresh
+    (younger than `max_age`) since the caller looked.
+    """
+    global _refresh_event
+    with _refresh_lock:
+        if _refresh_event is not None:
+            return _refresh_event, False
+        if _api_cache["data"] is not None and time.time() - _api_cache["ts"] < max_age:
+            return None, False
+        _refresh_event = threading.Event()
+        return _refresh_event, True
+
+def _run_refresh(event) -> None:
+    global _refresh_event
+    try:
+        _store_payload(compute_api_payload(), time.time())
+    finally:
+        with _refresh_lock:
+            _refresh_event = None
+        event.set()
+
+def _background_refresh(event) -> None:
+    try:
+        _run_refresh(event)
+    except Exception:
+        pass  # keep serving the previous payload; next request retries
+
+def _refresh_loop() -> None:
+    # proactive refresh so client requests rarely hit an expired cache
+    while True:
+        time.sleep(PREFETCH_INTERVAL_SEC)
+        event, leader = _claim_refresh(PREFETCH_INTERVAL_SEC)
+        if leader:
+            _background_refresh(event)
+
 def get_cached_payload():
+    """
+    Stale-while-revalidate: once the TTL expires, return the last good
+    payload and refresh it in the background. Blocks only on the first
+    request or when the payload is older than CACHE_MAX_STALE_SEC; then
+    one caller fetches and concurrent callers wait for its result.
+    """
     now = time.time()
-    if _api_cache["data"] is not None and (now - _api_cache["ts"] < CACHE_TTL_SEC):
-        return _api_cache["data"]
-    payload = compute_api_payload()
-    _api_cache.update({"ts": now, "data": payload})
-    return payload
+    data = _api_cache["data"]
+    age = now - _api_cache["ts"]
+    if data is None or age >= CACHE_MAX_STALE_SEC:
+        event, leader = _claim_refresh(CACHE_MAX_STALE_SEC)
+        if leader:
+            try:
+                _run_refresh(event)
+            except Exception:
+                # upstream down: the last good payload beats an error
+                if data is not None:
+                    return data
+                raise
+        elif event is not None:
+            event.wait(timeout=HTTP_TIMEOUT + 2)
+        fresh = _api_cache["data"]
+        if fresh is None:
+            raise RuntimeError("upstream data not available yet")
+        return fresh
+
+    if age >= CACHE_TTL_SEC:
+        event, leader = _claim_refresh(CACHE_TTL_SEC)
+        if leader:
+            _pool.submit(_background_refresh, event)
+    return data
+
+def get_cached_response() -> dict:
+    """Return the prebuilt responses (see _api_cache) for the current payload."""
+    get_cached_payload()
+    return _api_cache["response"]
 
 # ====== HTTP handler ======
+_NOT_FOUND = b"Not found\n"
+
 class Handler(BaseHTTPRequestHandler):
+    # keep-alive: pollers reuse one connection (and one thread) across requests
+    protocol_version = "HTTP/1.1"
+    timeout = CLIENT_IDLE_TIMEOUT
+
     def do_GET(self):
-        if self.path.split("?")[0] != "/api.json":
+        path, _, query = self.path.partition("?")
+        if path != "/api.json":
             self.send_response(404)
             self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(_NOT_FOUND)))
             self.end_headers()
-            self.wfile.write(b"Not found\n")
+            self.wfile.write(_NOT_FOUND)
             return
 
         try:
-            payload = get_cached_payload()
-            body = (json.dumps(payload, indent=2) + "\n").encode("utf-8")
-
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json; charset=utf-8")
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.send_header("Cache-Control", "public, max-age=30")
-            self.send_header("Content-Length", str(len(body)))
-            self.end_headers()
-            self.wfile.write(body)
+            # happy path: one write of the prebuilt status line + headers + body
+            responses = get_cached_response()
+            if urllib.parse.parse_qs(query).get("pretty") == ["1"]:
+                resp = _pretty_response(responses)
+            elif _accepts_gzip(self.headers.get("Accept-Encoding", "")):
+                resp = responses["gzip"]
+            else:
+                resp = responses["identity"]
+            inm = self.headers.get("If-None-Match")
+            if inm and _etag_matches(inm, resp["etag"]):
+                self._write_prebuilt(resp["not_modified"])
+            else:
+                self._write_prebuilt(resp["ok"])
         except Exception as e:
             err = {"error": str(e)}
             body = (json.dumps(err) + "\n").encode("utf-8")
@@ -274,12 +662,33 @@ class Handler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(body)
 
+    def _write_prebuilt(self, prebuilt) -> None:
+        # Date is per-request (RFC 9110 6.6.1), so only it and Server are added here
+        status_line, rest = prebuilt
+        self.wfile.write(b"".join((
+            status_line,
+            b"Server: ", self.version_string().encode("latin-1"), b"\r\n",
+            b"Date: ", self.date_time_string().encode("latin-1"), b"\r\n",
+            rest,
+        )))
+
     def log_message(self, fmt, *args):
         # quiet logs (comment out if you want access logs)
         return
 
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
 def main():
-    srv = ThreadingHTTPServer((HOST, PORT), Handler)
+    # warm the cache before binding so the first client is served from memory
+    try:
+        get_cached_payload()
+    except Exception as e:
+        print(f"Warm-up fetch failed, continuing: {e}")
+    threading.Thread(target=_refresh_loop, name="gl1-refresh", daemon=True).start()
+
+    srv = Server((HOST, PORT), Handler)
     print(f"Listening on http://{HOST}:{PORT}/api.json")
     srv.serve_forever()
 